@@ -7,6 +7,7 @@ import logging
 from abc import ABC, abstractmethod
 from typing import Any
 
+import orjson
 from botbuilder.core import TurnContext
 from data_models.conversation_data import ConversationData, ConversationTurn
 from tools import Tool
@@ -23,6 +24,8 @@ class Agent(ABC):
     allowing the rest of the application to work with any agent type.
     """
 
+    __slots__ = ()
+
     @property
     @abstractmethod
     def id(self) -> str:
@@ -110,6 +113,8 @@ class AbstractAgent(Agent):
 
     """
 
+    __slots__ = ("_id", "_name", "_description", "_prompt", "_tools", "_settings")
+
     def __init__(
         self,
         agent_id: str,
@@ -231,3 +236,19 @@ class AbstractAgent(Agent):
             "tools": {name: tool.to_dict() for name, tool in self._tools.items()},
             "settings": self._settings,
         }
+
+    def to_json_bytes(self) -> bytes:
+        """
+        Serialize the agent object to JSON.
+
+        Values orjson cannot serialize natively, such as the types in tool signatures, are converted with str.
+
+        Returns:
+            bytes: The UTF-8 encoded JSON representation of the agent object.
+
+        """
+        return orjson.dumps(
+            self.to_dict(),
+            default=str,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NAIVE_UTC,
+        )
@@ -2,25 +2,38 @@
 Defines the AbstractChatCompletionAgent class and its associated methods.
 """
 
+import asyncio
+import contextvars
+import functools
 import inspect
+import itertools
 import logging
 import os
+import time
 from abc import ABC
+from collections import OrderedDict
 from contextvars import ContextVar
-from datetime import datetime
-from typing import Any
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from trace.profiler import CoroutineProfiler, profiled
+from typing import Any, Callable, ClassVar, Iterable, Iterator, Optional
 
+import httpx
 from agents.abstract_agent import AbstractAgent
+from agents.semantic_cache import SemanticCache
 from azure.identity import ManagedIdentityCredential, get_bearer_token_provider
 from data_models.conversation_data import ConversationData, ConversationTurn
 from dotenv import load_dotenv
+from openai import DefaultAsyncHttpxClient
 from openai.lib.azure import AsyncAzureOpenAI
 from opentelemetry import trace
 from semantic_kernel import Kernel
 from semantic_kernel.agents import ChatCompletionAgent
 from semantic_kernel.connectors.ai.function_choice_behavior import FunctionChoiceBehavior
-from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion
+from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion, AzureTextEmbedding
 from semantic_kernel.contents.chat_history import ChatHistory
+from semantic_kernel.contents.chat_message_content import ChatMessageContent
+from semantic_kernel.contents.utils.author_role import AuthorRole
 from semantic_kernel.functions import kernel_function
 from semantic_kernel.functions.kernel_arguments import KernelArguments
 from semantic_kernel.functions.kernel_function_from_method import KernelFunctionFromMethod
@@ -40,6 +53,14 @@ AZURE_OPENAI_API_KEY = os.environ.get("AZURE_OPENAI_API_KEY")
 AZURE_OPENAI_API_VERSION = os.environ.get("AZURE_OPENAI_API_VERSION")
 AZURE_OPENAI_BASE_URL = os.environ.get("AZURE_OPENAI_BASE_URL")
 AZURE_OPENAI_CHAT_DEPLOYMENT_NAME = os.environ.get("AZURE_OPENAI_CHAT_DEPLOYMENT_NAME")
+AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME = os.environ.get("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME")
+# Off until the similarity threshold has been tuned against real conversations
+SEMANTIC_CACHE_ENABLED = os.environ.get("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.environ.get("SEMANTIC_CACHE_MAX_ENTRIES", "256"))
+SEMANTIC_CACHE_TTL_SECONDS = float(os.environ.get("SEMANTIC_CACHE_TTL_SECONDS", "3600"))
+SEMANTIC_CACHE_MIN_QUERY_WORDS = int(os.environ.get("SEMANTIC_CACHE_MIN_QUERY_WORDS", "5"))
+MAX_PERSISTENT_HISTORIES = 1024
 
 # Set up the bearer token provider for MID authentication
 token_provider = get_bearer_token_provider(
@@ -47,6 +68,158 @@ token_provider = get_bearer_token_provider(
 )
 agent_invoke_context: ContextVar[dict] = ContextVar("agent_invoke_context")
 
+# Author roles of conversation turns, any other role is treated as the assistant
+_AUTHOR_ROLES = {"user": AuthorRole.USER, "assistant": AuthorRole.ASSISTANT, "system": AuthorRole.SYSTEM}
+
+# Agents copy this behavior instead of constructing their own
+_AUTO_FUNCTION_CHOICE_BEHAVIOR = FunctionChoiceBehavior.Auto()
+
+
+@dataclass(frozen=True, slots=True)
+class AgentSettings:
+    """
+    Validated settings of a chat completion agent.
+    """
+
+    maximum_auto_invoke_attempts: Optional[int] = None
+
+    def __post_init__(self) -> None:
+        """
+        Coerce the settings to their expected types.
+        """
+        if self.maximum_auto_invoke_attempts is not None:
+            object.__setattr__(self, "maximum_auto_invoke_attempts", int(self.maximum_auto_invoke_attempts))
+
+    @classmethod
+    def from_dict(cls, settings: Optional[dict[str, Any]]) -> "AgentSettings":
+        """
+        Create the settings from the raw settings dictionary of an agent.
+
+        Args:
+            settings (Optional[dict[str, Any]]): The raw settings, if any.
+
+        Returns:
+            AgentSettings: The validated settings.
+
+        """
+        if not settings:
+            return cls()
+
+        return cls(maximum_auto_invoke_attempts=settings.get("maximum_auto_invoke_attempts"))
+
+
+# Azure OpenAI clients shared by all agents, keyed by environment
+_shared_clients: dict[str, AsyncAzureOpenAI] = {}
+
+
+def _get_shared_client(environment: str) -> AsyncAzureOpenAI:
+    """
+    Get the Azure OpenAI client shared by all agents in the given environment, creating it on first use.
+
+    The client's connection pool is sized for concurrent conversations and uses HTTP/2, so agents
+    reuse connections to the endpoint instead of opening their own.
+
+    Args:
+        environment (str): The environment the application runs in.
+
+    Returns:
+        AsyncAzureOpenAI: The shared client.
+
+    Raises:
+        Exception: If the environment is not supported.
+
+    """
+    client = _shared_clients.get(environment)
+    if client is not None:
+        return client
+
+    http_client = DefaultAsyncHttpxClient(
+        limits=httpx.Limits(max_keepalive_connections=100, max_connections=200),
+        http2=True,
+    )
+    if environment == "local":
+        client = AsyncAzureOpenAI(
+            api_key=AZURE_OPENAI_API_KEY,
+            azure_endpoint=AZURE_OPENAI_BASE_URL,
+            api_version=AZURE_OPENAI_API_VERSION,
+            http_client=http_client,
+        )
+    elif environment == "demo" or environment == "sandbox":
+        client = AsyncAzureOpenAI(
+            api_version=AZURE_OPENAI_API_VERSION,
+            azure_endpoint=AZURE_OPENAI_BASE_URL,
+            azure_ad_token_provider=token_provider,
+            http_client=http_client,
+        )
+    else:
+        raise Exception("Invalid environment. Please set the environment to 'local', 'demo', or 'sandbox'.")
+
+    _shared_clients[environment] = client
+    return client
+
+
+@functools.lru_cache(maxsize=512)
+def _cached_signature(function: Callable, name: str, description: str) -> inspect.Signature:
+    """
+    Get the signature of a tool function wrapped as a kernel function.
+
+    Args:
+        function (Callable): The tool function.
+        name (str): The name of the tool.
+        description (str): The description of the tool.
+
+    Returns:
+        inspect.Signature: The signature of the kernel function.
+
+    """
+    return inspect.signature(kernel_function(function, name, description))
+
+
+def _to_chat_messages(turns: Iterable[ConversationTurn]) -> Iterator[ChatMessageContent]:
+    """
+    Convert conversation turns to chat messages.
+
+    Args:
+        turns (Iterable[ConversationTurn]): The conversation turns.
+
+    Yields:
+        ChatMessageContent: The chat message of each turn.
+
+    """
+    for turn in turns:
+        yield ChatMessageContent(role=_AUTHOR_ROLES.get(turn.role, AuthorRole.ASSISTANT), content=turn.content)
+
+
+def _is_standalone_query(query: Optional[str]) -> bool:
+    """
+    Check whether a query is likely to be understood without the turns before it.
+
+    Short queries, such as "yes" or "and the second one?", usually refer to earlier turns, so their
+    cached responses would answer a different question.
+
+    Args:
+        query (Optional[str]): The user query.
+
+    Returns:
+        bool: True if the query is long enough to be cached.
+
+    """
+    return query is not None and len(query.split()) >= SEMANTIC_CACHE_MIN_QUERY_WORDS
+
+
+def _turn_marker(turn: ConversationTurn) -> tuple:
+    """
+    Get a cheap identity of a conversation turn that survives state storage round trips.
+
+    Args:
+        turn (ConversationTurn): The conversation turn.
+
+    Returns:
+        tuple: The role, creation time and content of the turn.
+
+    """
+    return (turn.role, turn.created_at, turn.content)
+
 
 class AbstractChatCompletionAgent(AbstractAgent, ABC):
     """
@@ -56,6 +229,11 @@ class AbstractChatCompletionAgent(AbstractAgent, ABC):
     as well as manage chat history and tool usage.
     """
 
+    __slots__ = ("_history_by_conv", "_kernel", "_semantic_cache", "_agent")
+
+    # Plugins built from identical tool definitions are shared by all agent instances
+    _plugin_cache: ClassVar[dict[frozenset, KernelPlugin]] = {}
+
     def __init__(
         self,
         agent_id: str,
@@ -76,30 +254,17 @@ class AbstractChatCompletionAgent(AbstractAgent, ABC):
             tools (dict[str, Tool]): Dictionary of tools available to the agent.
             settings (dict[str, Any], optional): Optional settings for the agent.
 
-        Raises:
-            Exception: If the environment is not supported.
-
         """
         super().__init__(agent_id, name, description, prompt, tools, settings)
 
+        # Long-lived chat histories keyed by conversation, tagged with the markers of the turns they mirror
+        self._history_by_conv: OrderedDict[str, tuple[list[tuple], ChatHistory]] = OrderedDict()
+
         # Create a semantic kernel
         self._kernel = Kernel()
 
         # Allow the kernel to use chat completion service
-        if ENVIRONMENT == "local":
-            async_openai_client = AsyncAzureOpenAI(
-                api_key=AZURE_OPENAI_API_KEY,
-                azure_endpoint=AZURE_OPENAI_BASE_URL,
-                api_version=AZURE_OPENAI_API_VERSION,
-            )
-        elif ENVIRONMENT == "demo" or ENVIRONMENT == "sandbox":
-            async_openai_client = AsyncAzureOpenAI(
-                api_version=AZURE_OPENAI_API_VERSION,
-                azure_endpoint=AZURE_OPENAI_BASE_URL,
-                azure_ad_token_provider=token_provider,
-            )
-        else:
-            raise Exception("Invalid environment. Please set the environment to 'local', 'demo', or 'sandbox'.")
+        async_openai_client = _get_shared_client(ENVIRONMENT)
 
         # Create the chat completion service with the async client
         chat_completion = AzureChatCompletion(
@@ -108,18 +273,33 @@ class AbstractChatCompletionAgent(AbstractAgent, ABC):
         )
         self._kernel.add_service(chat_completion)
 
+        # Cache responses by query embedding when enabled and an embedding deployment is configured
+        self._semantic_cache = None
+        if SEMANTIC_CACHE_ENABLED and AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME:
+            self._semantic_cache = SemanticCache(
+                AzureTextEmbedding(
+                    async_client=async_openai_client,
+                    deployment_name=AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME,
+                    service_id=f"{agent_id}_embedding",
+                ),
+                threshold=SEMANTIC_CACHE_THRESHOLD,
+                max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+                ttl_seconds=SEMANTIC_CACHE_TTL_SECONDS,
+            )
+
         # Add the plugin
         if tools:
             self._add_plugin(tools)
 
+        agent_settings = AgentSettings.from_dict(settings)
         execution_settings = self._kernel.get_prompt_execution_settings_from_service_id(service_id=agent_id)
-        execution_settings.function_choice_behavior = FunctionChoiceBehavior.Auto()
-
-        if settings:
-            if "maximum_auto_invoke_attempts" in settings:
-                execution_settings.function_choice_behavior.maximum_auto_invoke_attempts = int(
-                    settings["maximum_auto_invoke_attempts"]
-                )
+        execution_settings.function_choice_behavior = _AUTO_FUNCTION_CHOICE_BEHAVIOR.model_copy(
+            update=(
+                {"maximum_auto_invoke_attempts": agent_settings.maximum_auto_invoke_attempts}
+                if agent_settings.maximum_auto_invoke_attempts is not None
+                else None
+            )
+        )
 
         # Create the agent
         self._agent = ChatCompletionAgent(
@@ -134,20 +314,28 @@ class AbstractChatCompletionAgent(AbstractAgent, ABC):
         """
         Add a plugin to the kernel using the provided tools.
 
+        The plugin is built once per distinct set of tool definitions and reused by later instances.
+
         Args:
             tools (dict[str, Tool]): Dictionary of tools to add as plugins.
 
         """
-        functions = []
-        for tool in tools.values():
-            build_func = self._build_func(tool)
+        key = frozenset((tool_key, tool.name, tool.description, tool.function) for tool_key, tool in tools.items())
+        plugin = self._plugin_cache.get(key)
+        if plugin is None:
+            functions = []
+            for tool in tools.values():
+                build_func = self._build_func(tool)
+
+                function = KernelFunctionFromMethod(
+                    method=kernel_function(build_func, tool.name, tool.description), plugin_name=tool.name
+                )
+                functions.append(function)
 
-            function = KernelFunctionFromMethod(
-                method=kernel_function(build_func, tool.name, tool.description), plugin_name=tool.name
-            )
-            functions.append(function)
+            plugin = KernelPlugin(name="plugin", functions=functions)
+            self._plugin_cache[key] = plugin
 
-        self._kernel.add_plugin(KernelPlugin(name="plugin", functions=functions))
+        self._kernel.add_plugin(plugin)
 
     def _build_func(self, tool: Tool) -> Any:
         """
@@ -160,49 +348,122 @@ class AbstractChatCompletionAgent(AbstractAgent, ABC):
             Any: The built function.
 
         """
+        # Resolve the tool's properties once instead of on every call
+        function = tool.function
+        name = tool.name
+        executor = tool.executor
+        is_coroutine = inspect.iscoroutinefunction(function)
 
         async def new_plugin_func(*args: Any, **kwargs: Any) -> Any:
-            with tracer.start_as_current_span(f"{tool.name}_execute") as span:
-                span.set_attribute("tool_name", tool.name)
+            with tracer.start_as_current_span(f"{name}_execute") as span:
+                span.set_attribute("tool_name", name)
                 span.set_attribute("tool_description", tool.description)
                 span.set_attribute("args", args)
                 span.set_attributes(kwargs)
 
                 resp = None
 
-                start_time = datetime.now()
-                if inspect.iscoroutinefunction(tool.function):
-                    resp = await tool.function(*args, **kwargs)
+                start_time = datetime.now(timezone.utc).isoformat()
+                start_ns = time.perf_counter_ns()
+                if is_coroutine:
+                    resp = await function(*args, **kwargs)
+                elif executor is None:
+                    # Run synchronous tools off the event loop so they don't stall concurrent turns.
+                    # to_thread copies the context, so the tool's span stays current in the thread.
+                    resp = await asyncio.to_thread(function, *args, **kwargs)
                 else:
-                    resp = tool.function(*args, **kwargs)
-                end_time = datetime.now()
-                elapsed_time = end_time - start_time
+                    resp = await asyncio.get_running_loop().run_in_executor(
+                        executor, contextvars.copy_context().run, functools.partial(function, *args, **kwargs)
+                    )
+                duration_us = (time.perf_counter_ns() - start_ns) // 1000
 
-                tool_usage = agent_invoke_context.get()["tool_usage"]
-                tool_usage.append(
+                ctx = agent_invoke_context.get()
+                ctx["tool_usage"].append(
                     {
-                        "tool_name": tool.name,
+                        "tool_name": name,
                         "args": args,
                         "kwargs": kwargs,
                         "result": resp,
-                        "start_time": start_time.isoformat(),
-                        "duration": elapsed_time.microseconds,
+                        "start_time": start_time,
+                        "duration": duration_us,
                     }
                 )
 
-                attachments = extract_attachments(resp)
-                if attachments:
-                    agent_invoke_context.get()["attachments"].extend(attachments)
+                # Attachments are extracted from all results once the turn completes
+                ctx["raw_results"].append(resp)
 
                 return resp
 
         # Update the signature of the new function
-        plugin_func = kernel_function(tool.function, tool.name, tool.description)
-        signature = inspect.signature(plugin_func)
-        new_plugin_func.__signature__ = signature  # type: ignore[attr-defined]
+        new_plugin_func.__signature__ = _cached_signature(function, name, tool.description)  # type: ignore[attr-defined]
 
+        # Only add the profiling wrapper's frame to tool calls when profiling is enabled
+        if CoroutineProfiler.enabled:
+            return profiled(new_plugin_func, name=f"{name}_execute")
         return new_plugin_func
 
+    def _get_chat_history(self, conversation_data: ConversationData) -> ChatHistory:
+        """
+        Get the chat history to send for a conversation.
+
+        The persistent history of a conversation holds exactly one message per turn and is tagged
+        with the markers of the turns it mirrors. When the oldest turns were trimmed from the
+        conversation, their messages are dropped from the front, and the turns added since are
+        appended, so a full sliding window is updated instead of rebuilt. If the turns no longer
+        line up, e.g. after a restart or when the history was edited, the history is rebuilt. Both
+        paths produce the same messages.
+
+        Args:
+            conversation_data (ConversationData): The conversation data containing the history and current message.
+
+        Returns:
+            ChatHistory: The chat history.
+
+        """
+        turns = conversation_data.history
+
+        # Take the entry out while the agent runs so a failed invocation cannot leave it out of sync
+        cached = self._history_by_conv.pop(conversation_data.thread_id, None) if conversation_data.thread_id else None
+        if cached is not None:
+            markers, history = cached
+            current = [_turn_marker(turn) for turn in turns]
+            trimmed = markers.index(current[0]) if current and current[0] in markers else len(markers)
+            kept = len(markers) - trimmed
+            if current[:kept] == markers[trimmed:]:
+                del history.messages[:trimmed]
+                history.messages.extend(_to_chat_messages(itertools.islice(turns, kept, None)))
+                return history
+
+        history = ChatHistory()
+        history.messages.extend(_to_chat_messages(turns))
+
+        return history
+
+    def _store_chat_history(
+        self, conversation_data: ConversationData, response: ConversationTurn, history: ChatHistory
+    ) -> None:
+        """
+        Keep the chat history of a conversation for the next turn.
+
+        The history is tagged as mirroring the conversation's turns plus the agent's response,
+        which the caller adds to the conversation.
+
+        Args:
+            conversation_data (ConversationData): The conversation data the history was built from.
+            response (ConversationTurn): The agent's response.
+            history (ChatHistory): The chat history, with one message per turn including the response.
+
+        """
+        if not conversation_data.thread_id:
+            return
+
+        markers = [_turn_marker(turn) for turn in conversation_data.history]
+        markers.append(_turn_marker(response))
+        self._history_by_conv[conversation_data.thread_id] = (markers, history)
+        if len(self._history_by_conv) > MAX_PERSISTENT_HISTORIES:
+            self._history_by_conv.popitem(last=False)
+
+    @profiled
     async def process(self, conversation_data: ConversationData) -> ConversationTurn:
         """
         Process a user message and generate a response using the agent.
@@ -218,33 +479,61 @@ class AbstractChatCompletionAgent(AbstractAgent, ABC):
             span.set_attribute("agent_id", self.id)
             span.set_attribute("name", self.name)
 
+            # Serve semantically repeated standalone queries of the same conversation from the cache
+            cache = self._semantic_cache
+            query = None
+            if (
+                cache is not None
+                and conversation_data.thread_id
+                and conversation_data.history
+                and conversation_data.history[-1].role == "user"
+                and _is_standalone_query(conversation_data.history[-1].content)
+            ):
+                query = conversation_data.history[-1].content
+                scope = (conversation_data.thread_id, self.prompt)
+                cached_turn = await cache.lookup(scope, query)
+                span.set_attribute("semantic_cache_hit", cached_turn is not None)
+                if cached_turn is not None:
+                    return cached_turn
+
             token = agent_invoke_context.set(
                 {
                     "tool_usage": [],
-                    "attachments": [],
+                    "raw_results": [],
                 }
             )
 
-            history = ChatHistory()
-            for message in conversation_data.history:
-                if message.role == "user":
-                    history.add_user_message(message.content)
-                else:
-                    history.add_assistant_message(message.content)
+            history = self._get_chat_history(conversation_data)
+            prompt_length = len(history.messages)
 
             response = await self._agent.get_response(
                 history=history,
             )
 
+            # Drop the function call and result messages added by the agent, so the kept history
+            # holds one message per turn, like a rebuilt one
+            del history.messages[prompt_length:]
+
             ctx = agent_invoke_context.get()
             agent_invoke_context.reset(token)
 
-            turn = ConversationTurn(
+            turn = ConversationTurn.model_construct(
                 role="assistant",
                 content=response.content,
                 created_at=datetime.now(),
                 metadata={"tool_usage": ctx["tool_usage"]},
-                attachments=ctx["attachments"],
+                attachments=list(
+                    itertools.chain.from_iterable(
+                        extract_attachments(result) for result in ctx["raw_results"] if result is not None
+                    )
+                ),
             )
 
+            history.messages.extend(_to_chat_messages((turn,)))
+            self._store_chat_history(conversation_data, turn, history)
+
+            # Responses backed by tool calls depend on the exact arguments, e.g. operands, so they are never cached
+            if cache is not None and query is not None and not ctx["tool_usage"]:
+                cache.admit_in_background(scope, query, turn)
+
             return turn
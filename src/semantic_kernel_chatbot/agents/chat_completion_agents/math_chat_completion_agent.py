@@ -82,6 +82,8 @@ class MathSemanticKernelAgent(AbstractChatCompletionAgent):
     A Semantic Kernel Agent that can help you with math problems.
     """
 
+    __slots__ = ()
+
     def __init__(self) -> None:
         super().__init__(
             agent_id="math_semantic_kernel_agent",
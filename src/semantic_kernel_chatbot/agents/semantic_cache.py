@@ -0,0 +1,214 @@
+"""
+Defines the SemanticCache class used to short-circuit semantically repeated user queries.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Hashable, Optional
+
+import numpy as np
+from data_models.conversation_data import ConversationTurn
+from semantic_kernel.connectors.ai.embedding_generator_base import EmbeddingGeneratorBase
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _CacheEntry:
+    """A cached agent response and its bookkeeping."""
+
+    scope: Hashable
+    turn: ConversationTurn
+    expires_at: float
+    last_used: float
+
+
+class SemanticCache:
+    """
+    Bounded cache of agent responses keyed by the embedding of the user query.
+
+    Entries only match queries in the same scope, e.g. the same conversation, so a query is
+    never answered with another conversation's response. A lookup only embeds the query when
+    its scope has cached entries, and scores it against them with a single matrix-vector
+    product. The best entry is a hit when its cosine similarity reaches the configured
+    threshold. Entries expire after a time-to-live and, when the cache is full, the least
+    recently used entry is evicted.
+
+    The cache is best-effort: a failed lookup is a miss and a failed admission is dropped.
+    Admissions can run in the background, off the response path.
+    """
+
+    def __init__(
+        self,
+        embedding_service: EmbeddingGeneratorBase,
+        threshold: float = 0.95,
+        max_entries: int = 256,
+        ttl_seconds: float = 3600.0,
+        max_memoized_embeddings: int = 1024,
+    ):
+        """
+        Initialize the SemanticCache instance.
+
+        Args:
+            embedding_service (EmbeddingGeneratorBase): Service used to embed user queries.
+            threshold (float, optional): Minimum cosine similarity for a cache hit.
+            max_entries (int, optional): Maximum number of cached responses.
+            ttl_seconds (float, optional): Time-to-live of a cached response, in seconds.
+            max_memoized_embeddings (int, optional): Maximum number of query embeddings kept in memory.
+
+        """
+        self._embedding_service = embedding_service
+        self._threshold = threshold
+        self._max_entries = max_entries
+        self._ttl_seconds = ttl_seconds
+        self._max_memoized_embeddings = max_memoized_embeddings
+
+        # Row i of the matrix is the unit-normalized embedding of entry i
+        self._matrix: Optional[np.ndarray] = None
+        self._entries: list[_CacheEntry] = []
+        self._embeddings: OrderedDict[str, np.ndarray] = OrderedDict()
+
+        # Admissions running in the background, referenced until done so they aren't garbage collected
+        self._admissions: set[asyncio.Task] = set()
+
+    async def _embed(self, query: str) -> np.ndarray:
+        """
+        Embed a query, reusing the embedding of an identical query if one is memoized.
+
+        Args:
+            query (str): The query to embed.
+
+        Returns:
+            np.ndarray: The unit-normalized embedding of the query.
+
+        """
+        embedding = self._embeddings.get(query)
+        if embedding is not None:
+            self._embeddings.move_to_end(query)
+            return embedding
+
+        embedding = (await self._embedding_service.generate_embeddings([query]))[0].astype(np.float32)
+        norm = np.linalg.norm(embedding)
+        if norm:
+            embedding /= norm
+
+        self._embeddings[query] = embedding
+        if len(self._embeddings) > self._max_memoized_embeddings:
+            self._embeddings.popitem(last=False)
+
+        return embedding
+
+    def _remove(self, indexes: list[int]) -> None:
+        """
+        Remove the entries at the given indexes.
+
+        Args:
+            indexes (list[int]): The indexes of the entries to remove.
+
+        """
+        if not indexes:
+            return
+
+        removed = set(indexes)
+        self._entries = [entry for i, entry in enumerate(self._entries) if i not in removed]
+        self._matrix = np.delete(self._matrix, indexes, axis=0) if self._entries else None
+
+    def _evict_expired(self, now: float) -> None:
+        """
+        Remove the entries whose time-to-live has elapsed.
+
+        Args:
+            now (float): The current monotonic time.
+
+        """
+        self._remove([i for i, entry in enumerate(self._entries) if entry.expires_at <= now])
+
+    async def lookup(self, scope: Hashable, query: str) -> Optional[ConversationTurn]:
+        """
+        Look up a cached response for a query.
+
+        Args:
+            scope (Hashable): The scope of the query, only entries admitted in the same scope can match.
+            query (str): The user query.
+
+        Returns:
+            Optional[ConversationTurn]: A copy of the cached response, or None on a miss or failure.
+
+        """
+        # Skip the embedding round trip when nothing in the scope could match
+        if not any(entry.scope == scope for entry in self._entries):
+            return None
+
+        try:
+            embedding = await self._embed(query)
+        except Exception:
+            logger.exception("Semantic cache lookup failed")
+            return None
+
+        # Entries are selected after embedding, since other turns may have changed them meanwhile
+        now = time.monotonic()
+        self._evict_expired(now)
+        candidates = [i for i, entry in enumerate(self._entries) if entry.scope == scope]
+        if not candidates:
+            return None
+
+        assert self._matrix is not None
+        similarities = self._matrix[candidates] @ embedding
+        best = int(np.argmax(similarities))
+        similarity = float(similarities[best])
+        if similarity < self._threshold:
+            return None
+
+        entry = self._entries[candidates[best]]
+        entry.last_used = now
+        logger.info("Semantic cache hit with similarity %.4f", similarity)
+
+        return ConversationTurn.model_construct(
+            role=entry.turn.role,
+            content=entry.turn.content,
+            created_at=datetime.now(),
+            metadata={**entry.turn.metadata, "semantic_cache_similarity": similarity},
+            attachments=list(entry.turn.attachments),
+        )
+
+    async def admit(self, scope: Hashable, query: str, turn: ConversationTurn) -> None:
+        """
+        Cache the response to a query.
+
+        Args:
+            scope (Hashable): The scope of the query.
+            query (str): The user query.
+            turn (ConversationTurn): The agent's response to the query.
+
+        """
+        try:
+            embedding = await self._embed(query)
+        except Exception:
+            logger.exception("Semantic cache admission failed")
+            return
+
+        now = time.monotonic()
+        self._evict_expired(now)
+        if len(self._entries) >= self._max_entries:
+            self._remove([min(range(len(self._entries)), key=lambda i: self._entries[i].last_used)])
+
+        self._entries.append(_CacheEntry(scope=scope, turn=turn, expires_at=now + self._ttl_seconds, last_used=now))
+        self._matrix = embedding[np.newaxis, :] if self._matrix is None else np.vstack((self._matrix, embedding))
+
+    def admit_in_background(self, scope: Hashable, query: str, turn: ConversationTurn) -> None:
+        """
+        Cache the response to a query without waiting for the query to be embedded.
+
+        Args:
+            scope (Hashable): The scope of the query.
+            query (str): The user query.
+            turn (ConversationTurn): The agent's response to the query.
+
+        """
+        task = asyncio.create_task(self.admit(scope, query, turn))
+        self._admissions.add(task)
+        task.add_done_callback(self._admissions.discard)
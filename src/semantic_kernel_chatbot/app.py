@@ -2,12 +2,14 @@
 Main application entry point for the Semantic Kernel Chatbot.
 """
 
+import asyncio
 import logging
 import os
 import sys
 import traceback
 from datetime import datetime
 from trace.otel_configuration import OtelConfiguration
+from trace.profiler import CoroutineProfiler
 
 from agents.chat_completion_agents.math_chat_completion_agent import MathSemanticKernelAgent
 from aiohttp import web
@@ -31,12 +33,18 @@ from config import DefaultConfig
 from dialogs import LoginDialog
 from dotenv import load_dotenv
 
+try:
+    import uvloop
+except ImportError:  # uvloop is not available on Windows
+    uvloop = None
+
 load_dotenv()
 CONFIG = DefaultConfig()
 ADAPTER = CloudAdapter(ConfigurationBotFrameworkAuthentication(CONFIG))
 
-# Setup logging and tracing
+# Setup logging, tracing and profiling
 OtelConfiguration.configure()
+CoroutineProfiler.configure()
 
 # Create logger
 logger = logging.getLogger(__name__)
@@ -103,6 +111,10 @@ dialog = LoginDialog()
 BOT = SemanticKernelBot(conversation_state, user_state, dialog, MathSemanticKernelAgent())
 
 
+# Optional cap on the number of turns processed at once, off by default
+TURN_SEMAPHORE = asyncio.Semaphore(CONFIG.MAX_CONCURRENT_TURNS) if CONFIG.MAX_CONCURRENT_TURNS > 0 else None
+
+
 async def messages(req: Request) -> Response:
     """
     Handle incoming messages from the Bot Framework.
@@ -114,15 +126,35 @@ async def messages(req: Request) -> Response:
         Response: The response to the incoming request.
 
     """
-    return await ADAPTER.process(req, BOT)
+    if TURN_SEMAPHORE is None:
+        return await ADAPTER.process(req, BOT)
+
+    async with TURN_SEMAPHORE:
+        return await ADAPTER.process(req, BOT)
+
+
+async def profile(req: Request) -> Response:
+    """
+    Report the statistics collected by the coroutine profiler.
+
+    Args:
+        req (Request): The incoming request.
+
+    Returns:
+        Response: The profiler statistics as JSON.
+
+    """
+    return web.json_response(CoroutineProfiler.snapshot())
 
 
 APP = web.Application(middlewares=[aiohttp_error_middleware])
 APP.router.add_post("/api/messages", messages)
+if CoroutineProfiler.enabled:
+    APP.router.add_get("/api/profile", profile)
 
 if __name__ == "__main__":
     try:
         logger.info("Starting Semantic Kernel Chatbot...")
-        web.run_app(APP, host="0.0.0.0", port=CONFIG.PORT)
+        web.run_app(APP, host="0.0.0.0", port=CONFIG.PORT, loop=uvloop.new_event_loop() if uvloop is not None else None)
     except Exception as error:
         raise error
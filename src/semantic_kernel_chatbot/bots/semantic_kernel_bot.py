@@ -2,10 +2,14 @@
 Semantic Kernel Bot implementation for handling conversations with an agent.
 """
 
+import asyncio
+import contextlib
 import logging
 import os
+import time
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Any, Optional
+from typing import Any, Awaitable, Callable, Optional
 
 import jwt
 from agents.abstract_agent import AbstractAgent
@@ -22,6 +26,50 @@ from utils import get_activity_card
 logger = logging.getLogger(__name__)
 tracer = trace.get_tracer(__name__)
 
+# Cached logins are refreshed this long before the token expires
+TOKEN_EXPIRY_MARGIN_SECONDS = 60
+
+# Turn state key of the interim message handler picked for the turn's channel
+_INTERIM_MESSAGE_HANDLER_KEY = "InterimMessageHandler"
+
+
+def _new_conversation_data() -> ConversationData:
+    """Create the state of a conversation seen for the first time."""
+    return ConversationData([])
+
+
+@dataclass(frozen=True)
+class BotConfig:
+    """
+    Bot settings read from the environment.
+    """
+
+    sso_enabled: bool
+    sso_config_name: str
+    welcome_message: str
+    streaming: bool
+    tracing_enabled: bool
+
+    @classmethod
+    def from_env(cls) -> "BotConfig":
+        """
+        Read the bot settings from the environment.
+
+        Call this once the environment is loaded, e.g. after load_dotenv.
+
+        Returns:
+            BotConfig: The bot settings.
+
+        """
+        return cls(
+            sso_enabled=os.getenv("SSO_ENABLED", "false").lower() == "true",
+            sso_config_name=os.getenv("SSO_CONFIG_NAME", "default"),
+            welcome_message=os.getenv("LLM_WELCOME_MESSAGE", "Hello and welcome to the Semantic Kernel Bot Python!"),
+            streaming=os.getenv("LLM_STREAMING", "true").lower() == "true",
+            # Spans are only recorded when an exporter is configured, see OtelConfiguration
+            tracing_enabled=bool(os.getenv("APPLICATIONINSIGHTS_CONNECTION_STRING")),
+        )
+
 
 class SemanticKernelBot(ActivityHandler):
     """
@@ -41,14 +89,17 @@ class SemanticKernelBot(ActivityHandler):
         self.user_profile_accessor = self.user_state.create_property("UserProfile")
 
         self.dialog = dialog
-        self.welcome_message = os.getenv("LLM_WELCOME_MESSAGE", "Hello and welcome to the Semantic Kernel Bot Python!")
+        self.dialog_set = DialogSet(self.conversation_state.create_property("DialogState"))
+        self.dialog_set.add(self.dialog)
+        # Settings are read when the bot is created, after the application has loaded the environment
+        config = BotConfig.from_env()
+        self.welcome_message = config.welcome_message
+        self.streaming = config.streaming
+        self.tracing_enabled = config.tracing_enabled
         self.agent = agent
 
-        self.sso_enabled = os.getenv("SSO_ENABLED", False)
-        if self.sso_enabled == "false":
-            self.sso_enabled = False
-        print(self.sso_enabled)
-        self.sso_config_name = os.getenv("SSO_CONFIG_NAME", "default")
+        self.sso_enabled = config.sso_enabled
+        self.sso_config_name = config.sso_config_name
 
     async def on_turn(self, turn_context: TurnContext) -> None:
         """
@@ -61,8 +112,10 @@ class SemanticKernelBot(ActivityHandler):
         await super().on_turn(turn_context)
 
         # Save any state changes. The load happened during the execution of the Dialog.
-        await self.conversation_state.save_changes(turn_context)
-        await self.user_state.save_changes(turn_context)
+        await asyncio.gather(
+            self.conversation_state.save_changes(turn_context),
+            self.user_state.save_changes(turn_context),
+        )
 
     async def handle_login(self, turn_context: TurnContext) -> bool:
         """
@@ -81,8 +134,11 @@ class SemanticKernelBot(ActivityHandler):
             await self.handle_logout(turn_context)
             return False
 
-        user_profile_accessor = self.user_state.create_property("UserProfile")
-        user_profile = await user_profile_accessor.get(turn_context, lambda: {})
+        user_profile = await self.user_profile_accessor.get(turn_context, dict)
+
+        # Skip the token service while the token the name was decoded from is still valid
+        if user_profile.get("name") and user_profile.get("token_expires_at", 0) > time.time():
+            return True
 
         user_token_client = turn_context.turn_state.get(UserTokenClient.__name__, None)
 
@@ -92,11 +148,10 @@ class SemanticKernelBot(ActivityHandler):
             )
             decoded_token = jwt.decode(user_token.token, options={"verify_signature": False})
             user_profile["name"] = decoded_token.get("name")
+            user_profile["token_expires_at"] = decoded_token.get("exp", 0) - TOKEN_EXPIRY_MARGIN_SECONDS
             return True
         except Exception:
-            dialog_set = DialogSet(self.conversation_state.create_property("DialogState"))
-            dialog_set.add(self.dialog)
-            dialog_context = await dialog_set.create_context(turn_context)
+            dialog_context = await self.dialog_set.create_context(turn_context)
             results = await dialog_context.continue_dialog()
             if results.status == DialogTurnStatus.Empty:
                 await dialog_context.begin_dialog(self.dialog.id)
@@ -110,6 +165,9 @@ class SemanticKernelBot(ActivityHandler):
             turn_context (TurnContext): The context for the current turn of conversation.
 
         """
+        user_profile = await self.user_profile_accessor.get(turn_context, dict)
+        user_profile.pop("token_expires_at", None)
+
         user_token_client = turn_context.turn_state.get(UserTokenClient.__name__, None)
         await user_token_client.sign_out_user(
             turn_context.activity.from_property.id, self.sso_config_name, turn_context.activity.channel_id
@@ -133,32 +191,73 @@ class SemanticKernelBot(ActivityHandler):
             Optional[str]: The ID of the sent or updated message.
 
         """
-        stream_supported = self.streaming and turn_context.activity.channel_id == "directline"
-        update_supported = self.streaming and turn_context.activity.channel_id == "msteams"
+        handler = turn_context.turn_state.get(_INTERIM_MESSAGE_HANDLER_KEY)
+        if handler is None:
+            # The channel does not change within a turn, so the handler is picked once per turn
+            handler = self._pick_interim_message_handler(turn_context.activity.channel_id)
+            turn_context.turn_state[_INTERIM_MESSAGE_HANDLER_KEY] = handler
 
-        # If we can neither stream or update, return null
-        if stream_type == "typing" and not stream_supported and not update_supported:
-            return None
+        return await handler(turn_context, interim_message, stream_sequence, stream_id, stream_type)
+
+    def _pick_interim_message_handler(self, channel_id: str) -> Callable[..., Awaitable[Optional[str]]]:
+        """
+        Pick the interim message handler supported by a channel.
 
-        # If we can update messages, do so
-        if update_supported:
-            if stream_id is None:
-                create_activity = await turn_context.send_activity(interim_message)
-                return create_activity.id
-            else:
-                update_message = MessageFactory.text(interim_message)
-                update_message.id = stream_id
-                update_message.type = "message"
-                update_activity = await turn_context.update_activity(update_message)
-                return update_activity.id
-        # If we can stream messages, do so
-        channel_data = {
+        Args:
+            channel_id (str): The ID of the channel.
+
+        Returns:
+            Callable[..., Awaitable[Optional[str]]]: The handler with the signature of send_interim_message.
+
+        """
+        if self.streaming and channel_id == "msteams":
+            return self._update_interim_message
+        if self.streaming and channel_id == "directline":
+            return self._stream_interim_message
+        return self._send_final_message
+
+    async def _update_interim_message(
+        self, turn_context: TurnContext, interim_message: str, stream_sequence: Any, stream_id: str, stream_type: str
+    ) -> Optional[str]:
+        """
+        Send an interim message by updating the previously sent message, if any.
+        """
+        if stream_id is None:
+            create_activity = await turn_context.send_activity(interim_message)
+            return create_activity.id
+
+        update_message = MessageFactory.text(interim_message)
+        update_message.id = stream_id
+        update_message.type = "message"
+        update_activity = await turn_context.update_activity(update_message)
+        return update_activity.id
+
+    async def _stream_interim_message(
+        self, turn_context: TurnContext, interim_message: str, stream_sequence: Any, stream_id: str, stream_type: str
+    ) -> Optional[str]:
+        """
+        Send an interim message as part of a stream.
+        """
+        message = MessageFactory.text(interim_message)
+        message.channel_data = {
             "streamId": stream_id,
             "streamSequence": stream_sequence,
             "streamType": "streaming" if stream_type == "typing" else "final",
         }
+        message.type = stream_type
+        activity = await turn_context.send_activity(message)
+        return activity.id
+
+    async def _send_final_message(
+        self, turn_context: TurnContext, interim_message: str, stream_sequence: Any, stream_id: str, stream_type: str
+    ) -> Optional[str]:
+        """
+        Send only the final message, for channels that can neither stream nor update messages.
+        """
+        if stream_type == "typing":
+            return None
+
         message = MessageFactory.text(interim_message)
-        message.channel_data = channel_data if stream_supported else None
         message.type = stream_type
         activity = await turn_context.send_activity(message)
         return activity.id
@@ -173,9 +272,10 @@ class SemanticKernelBot(ActivityHandler):
             turn_context (TurnContext): The context for the current turn of conversation.
 
         """
-        for member in members_added:
-            if member.id != turn_context.activity.recipient.id:
-                await turn_context.send_activity(self.welcome_message)
+        bot_id = turn_context.activity.recipient.id
+        await asyncio.gather(
+            *(turn_context.send_activity(self.welcome_message) for member in members_added if member.id != bot_id)
+        )
 
     async def on_message_activity(self, turn_context: TurnContext) -> None:
         """
@@ -185,22 +285,34 @@ class SemanticKernelBot(ActivityHandler):
             turn_context (TurnContext): The context for the current turn of conversation.
 
         """
-        with tracer.start_as_current_span("on_message_activity") as span:
-            span.set_attribute("activity_id", turn_context.activity.id)
-            span.set_attribute("user_id", turn_context.activity.from_property.id)
-            span.set_attribute("text", turn_context.activity.text)
-            span.set_attribute("channel_id", turn_context.activity.channel_id)
-            span.set_attribute("conversation_id", turn_context.activity.conversation.id)
-            span.set_attribute("recipient_id", turn_context.activity.recipient.id)
+        span_context = contextlib.nullcontext()
+        if self.tracing_enabled:
+            activity = turn_context.activity
+            span_context = tracer.start_as_current_span(
+                "on_message_activity",
+                attributes={
+                    "activity_id": activity.id,
+                    "user_id": activity.from_property.id,
+                    "text": activity.text,
+                    "channel_id": activity.channel_id,
+                    "conversation_id": activity.conversation.id,
+                    "recipient_id": activity.recipient.id,
+                },
+            )
 
+        with span_context:
             logger.info("Received message: %s", turn_context.activity.text)
 
             # Load conversation state
-            conversation_data = await self.conversation_data_accessor.get(turn_context, ConversationData([]))
+            conversation_data = await self.conversation_data_accessor.get(turn_context, _new_conversation_data)
+            if conversation_data.thread_id is None:
+                conversation_data.thread_id = turn_context.activity.conversation.id
 
             # Add user message to history
             conversation_data.add_turn(
-                ConversationTurn(role="user", content=turn_context.activity.text, created_at=datetime.now())
+                ConversationTurn.model_construct(
+                    role="user", content=turn_context.activity.text, created_at=datetime.now()
+                )
             )
 
             response = await self.agent.process(conversation_data)
@@ -13,3 +13,4 @@ class DefaultConfig:
     APP_PASSWORD = os.environ.get("MicrosoftAppPassword", "")
     APP_TYPE = os.environ.get("MicrosoftAppType", "MultiTenant")
     APP_TENANTID = os.environ.get("MicrosoftAppTenantId", "")
+    MAX_CONCURRENT_TURNS = int(os.environ.get("MAX_CONCURRENT_TURNS", "0"))
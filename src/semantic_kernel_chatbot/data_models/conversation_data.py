@@ -1,5 +1,6 @@
 """Conversation data models for managing conversation history and turns."""
 
+from collections import deque
 from datetime import datetime
 from typing import Any
 
@@ -10,6 +11,7 @@ class ConversationTurn(BaseModel):
     """
     Data model for a single turn in a conversation.
     Represents a message in the conversation history.
+    Turns built by the bot itself use model_construct, which skips validation.
     """
 
     role: str  # "user", "assistant", "system"
@@ -32,7 +34,7 @@ class ConversationData:
         thread_id: str = None,
     ):
         self.thread_id = thread_id
-        self.history = history
+        self.history = deque(history, maxlen=max_turns)
         self.max_turns = max_turns
 
     def add_turn(self, turn: ConversationTurn) -> None:
@@ -40,9 +42,11 @@ class ConversationData:
         Add a new turn to the conversation history.
         If the history exceeds max_turns, the oldest turn is removed.
         """
-        self.history.append(turn)
-        if len(self.history) > self.max_turns:
-            self.history.pop(0)
+        history = self.history
+        if type(history) is not deque or history.maxlen != self.max_turns:
+            # State stored before the history was bounded is restored with a plain list
+            history = self.history = deque(history, maxlen=self.max_turns)
+        history.append(turn)
 
     def toMessages(self) -> list[dict[str, str]]:
         """
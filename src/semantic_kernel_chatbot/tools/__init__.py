@@ -3,7 +3,8 @@ Core Abstract tools for the MACS project.
 """
 
 from abc import ABC, abstractmethod
-from typing import Any, Callable
+from concurrent.futures import Executor
+from typing import Any, Callable, Optional
 
 
 class Tool(ABC):
@@ -29,6 +30,11 @@ class Tool(ABC):
         """Return the function that implements the tool."""
         pass
 
+    @property
+    def executor(self) -> Optional[Executor]:
+        """Return the executor that runs the synchronous function, or None for the event loop's default."""
+        return None
+
     @abstractmethod
     def to_dict(self) -> dict[str, Any]:
         """Return a dictionary representation of the tool."""
@@ -38,10 +44,18 @@ class Tool(ABC):
 class AbstractTool(Tool):
     """Abstract base class for tools."""
 
-    def __init__(self, name: str, description: str, function: Callable):
+    def __init__(self, name: str, description: str, function: Callable, executor: Optional[Executor] = None):
         self._name = name
         self._description = description
         self._function = function
+        self._executor = executor
+
+        # Name, description and function never change, so the dictionary form is built once
+        self._dict_cache = {
+            "name": name,
+            "description": description,
+            "function": function.__annotations__,
+        }
 
     @property
     def name(self) -> str:
@@ -76,6 +90,17 @@ class AbstractTool(Tool):
         """
         return self._function
 
+    @property
+    def executor(self) -> Optional[Executor]:
+        """
+        Get the executor that runs the tool's function when it is synchronous.
+
+        Returns:
+            Optional[Executor]: The executor, or None to use the event loop's default executor.
+
+        """
+        return self._executor
+
     @property
     def function_signature(self) -> dict[str, Any]:
         """
@@ -93,11 +118,7 @@ class AbstractTool(Tool):
 
         Returns:
             dict[str, Any]: A dictionary representation of the tool, including its name,
-              description, and function signature.
+              description, and function signature. The dictionary is shared and must not be modified.
 
         """
-        return {
-            "name": self._name,
-            "description": self._description,
-            "function": self.function_signature,
-        }
+        return self._dict_cache
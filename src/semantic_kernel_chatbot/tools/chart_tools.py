@@ -1,6 +1,6 @@
 """Chart Tools Module."""
 
-import uuid
+import secrets
 
 from data_models.attachments import (
     LineChart,
@@ -57,7 +57,7 @@ class LineChartTool(AbstractTool):
             LineChart: An instance of LineChart containing the generated chart.
 
         """
-        return LineChart(id=str(uuid.uuid4()), title=title, data=data)
+        return LineChart(id=secrets.token_hex(16), title=title, data=data)
 
 
 class PieChartTool(AbstractTool):
@@ -83,7 +83,7 @@ class PieChartTool(AbstractTool):
             PieChart: An instance of PieChart containing the generated chart.
 
         """
-        return PieChart(id=str(uuid.uuid4()), title=title, data=data)
+        return PieChart(id=secrets.token_hex(16), title=title, data=data)
 
 
 class VerticalBarChartTool(AbstractTool):
@@ -109,4 +109,4 @@ class VerticalBarChartTool(AbstractTool):
             VerticalBarChart: An instance of VerticalBarChart containing the generated chart.
 
         """
-        return VerticalBarChart(id=str(uuid.uuid4()), title=title, data=data)
+        return VerticalBarChart(id=secrets.token_hex(16), title=title, data=data)
@@ -3,29 +3,89 @@
 from tools import AbstractTool
 
 
+def add(x: float, y: float) -> float:
+    """
+    Add two numbers.
+
+    Args:
+        x (float): The first number.
+        y (float): The second number.
+
+    Returns:
+        float: The sum of the two numbers.
+
+    """
+    return x + y
+
+
+def subtract(x: float, y: float) -> float:
+    """
+    Subtract two numbers.
+
+    Args:
+        x (float): The number to subtract from.
+        y (float): The number to subtract.
+
+    Returns:
+        float: The difference of the two numbers.
+
+    """
+    return x - y
+
+
+def multiply(x: float, y: float) -> float:
+    """
+    Multiply two numbers.
+
+    Args:
+        x (float): The first number.
+        y (float): The second number.
+
+    Returns:
+        float: The product of the two numbers.
+
+    """
+    return x * y
+
+
+def divide(x: float, y: float) -> float:
+    """
+    Divide two numbers.
+
+    Args:
+        x (float): The dividend.
+        y (float): The divisor.
+
+    Returns:
+        float: The quotient of the two numbers.
+
+    """
+    return x / y
+
+
 class AddTool(AbstractTool):
     """Tool for adding two numbers."""
 
     def __init__(self, name: str = "Add", description: str = "Add two numbers, such as 6+3") -> None:
-        super().__init__(name=name, description=description, function=staticmethod(lambda x, y: x + y))
+        super().__init__(name=name, description=description, function=add)
 
 
 class SubtractTool(AbstractTool):
     """Tool for subtracting two numbers."""
 
     def __init__(self, name: str = "Subtract", description: str = "Subtract two numbers, such as 6-3") -> None:
-        super().__init__(name=name, description=description, function=staticmethod(lambda x, y: x - y))
+        super().__init__(name=name, description=description, function=subtract)
 
 
 class MultiplyTool(AbstractTool):
     """Tool for multiplying two numbers."""
 
     def __init__(self, name: str = "Multiply", description: str = "Multiply two numbers, such as 6*3") -> None:
-        super().__init__(name=name, description=description, function=staticmethod(lambda x, y: x * y))
+        super().__init__(name=name, description=description, function=multiply)
 
 
 class DivideTool(AbstractTool):
     """Tool for dividing two numbers."""
 
     def __init__(self, name: str = "Divide", description: str = "Divide two numbers, such as 6/3") -> None:
-        super().__init__(name=name, description=description, function=staticmethod(lambda x, y: x / y))
+        super().__init__(name=name, description=description, function=divide)
@@ -23,6 +23,9 @@ class OtelConfiguration:
         Configures OpenTelemetry and Azure Monitor if not already configured.
         """
         if not cls._monitor_configured and os.environ.get("APPLICATIONINSIGHTS_CONNECTION_STRING"):
+            # Spans are queued by the batch span processor and exported from its worker thread, so the
+            # event loop only pays for the enqueue. Spans are dropped rather than blocking once the queue is full.
+            # The queue is tuned with the standard OTEL_BSP_* environment variables.
             configure_azure_monitor()
             logging.getLogger("azure.core.pipeline.policies.http_logging_policy").setLevel(logging.WARNING)
             logging.getLogger("azure.identity").setLevel(logging.WARNING)
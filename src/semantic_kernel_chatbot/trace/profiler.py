@@ -0,0 +1,83 @@
+"""Lightweight profiler for coroutines in the agent call tree."""
+
+import functools
+import os
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+
+class CoroutineProfiler:
+    """
+    Collects the call count and cumulative wall time of profiled coroutines.
+
+    Profiling is enabled by setting the AIOPROF environment variable to 1.
+    """
+
+    enabled = False
+    _stats: dict[str, list[int]] = {}
+
+    @classmethod
+    def configure(cls) -> None:
+        """
+        Enables profiling if requested by the environment.
+        """
+        cls.enabled = os.environ.get("AIOPROF") == "1"
+
+    @classmethod
+    def record(cls, name: str, elapsed_ns: int) -> None:
+        """
+        Record a completed call.
+
+        Args:
+            name (str): The name of the profiled coroutine.
+            elapsed_ns (int): The wall time of the call, in nanoseconds.
+
+        """
+        stats = cls._stats.get(name)
+        if stats is None:
+            cls._stats[name] = [1, elapsed_ns]
+        else:
+            stats[0] += 1
+            stats[1] += elapsed_ns
+
+    @classmethod
+    def snapshot(cls) -> dict[str, dict[str, float]]:
+        """
+        Get the collected statistics, slowest coroutines first.
+
+        Returns:
+            dict[str, dict[str, float]]: The call count, total and mean milliseconds per coroutine.
+
+        """
+        return {
+            name: {"count": count, "total_ms": total_ns / 1e6, "mean_ms": total_ns / count / 1e6}
+            for name, (count, total_ns) in sorted(cls._stats.items(), key=lambda item: item[1][1], reverse=True)
+        }
+
+
+def profiled(coro_fn: Callable[..., Awaitable[Any]], name: Optional[str] = None) -> Callable[..., Awaitable[Any]]:
+    """
+    Wrap a coroutine function so its calls are recorded by the CoroutineProfiler.
+
+    Args:
+        coro_fn (Callable[..., Awaitable[Any]]): The coroutine function to profile.
+        name (Optional[str]): The name to record calls under, defaults to the function's qualified name.
+
+    Returns:
+        Callable[..., Awaitable[Any]]: The wrapped coroutine function.
+
+    """
+    record_name = name or coro_fn.__qualname__
+
+    @functools.wraps(coro_fn)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        if not CoroutineProfiler.enabled:
+            return await coro_fn(*args, **kwargs)
+
+        start_ns = time.perf_counter_ns()
+        try:
+            return await coro_fn(*args, **kwargs)
+        finally:
+            CoroutineProfiler.record(record_name, time.perf_counter_ns() - start_ns)
+
+    return wrapper
@@ -2,46 +2,83 @@
 Utility functions.
 """
 
-import json
+from __future__ import annotations
+
+import functools
 import logging
-from typing import Any
+from typing import Any, Callable, Optional, cast
 
+import orjson
 from botbuilder.core import CardFactory
-from botbuilder.schema import Activity, ActivityTypes, Attachment
+from botbuilder.schema import Activity, ActivityTypes
 from data_models.attachments import Chart, Citation, LineChart, Media, PieChart, VerticalBarChart
 from data_models.conversation_data import ConversationTurn
 
 logger = logging.getLogger(__name__)
 
+# Attachment types collected from tool results
+_COLLECT_TYPES = (Citation, Media, Chart)
+
+# Ordered container types walked when collecting attachments
+_SEQUENCE_TYPES = (list, tuple)
+
 
-def extract_attachments(result: Any) -> list[Any]:
+def extract_attachments(result: object) -> list[Citation | Media | Chart]:
     """
     Extracts attachments from the result object.
 
     Args:
-        result (Any): The result object from which to extract attachments.
+        result (object): The result object from which to extract attachments.
 
     Returns:
-       list[Any]: A list containing attachments categorized by their type.
+       list[Citation | Media | Chart]: A list containing attachments categorized by their type.
 
     """
-    attachments = []
-
-    def _collect(value: Any) -> None:
-        if isinstance(value, Citation) or isinstance(value, Media) or isinstance(value, Chart):
-            attachments.append(value)
-        elif isinstance(value, (list, tuple, set)):
-            for item in value:
-                _collect(item)
+    attachments: list[Citation | Media | Chart] = []
+
+    # Walk the result depth-first with an explicit stack, so deeply nested results can't exhaust the recursion limit.
+    # Sequences are pushed in reverse so attachments keep the order in which they appear in the result.
+    stack: list[object] = [result]
+    push = stack.extend
+    pop = stack.pop
+    add = attachments.append
+    collect_types = _COLLECT_TYPES
+    sequence_types = _SEQUENCE_TYPES
+    while stack:
+        value = pop()
+        value_type = type(value)
+        # Exact type checks don't narrow value for type checkers, hence the casts
+        if value_type is list or value_type is tuple:
+            push(reversed(cast("list[object]", value)))
+        elif value_type is dict:
+            push(reversed(cast("dict[object, object]", value).values()))
+        elif isinstance(value, collect_types):
+            add(value)
+        # Subclasses of the containers are rare, so they are only checked last. Sets aren't walked, the
+        # attachment models are unhashable and can't be in a set, even nested in a tuple.
+        elif isinstance(value, sequence_types):
+            push(reversed(value))
         elif isinstance(value, dict):
-            for item in value.values():
-                _collect(item)
+            push(reversed(value.values()))
 
-    _collect(result)
     return attachments
 
 
-def get_citations_element(citation: Citation) -> Attachment:
+def _dumps(value: object) -> str:
+    """
+    Serializes a value to a JSON string.
+
+    Args:
+        value (object): The value to serialize.
+
+    Returns:
+        str: The JSON representation of the value.
+
+    """
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+
+def get_citations_element(citation: Citation) -> dict[str, Any]:
     """
     Generates an Adaptive Card for displaying citations.
 
@@ -49,7 +86,7 @@ def get_citations_element(citation: Citation) -> Attachment:
         citation (Citation): The citation object.
 
     Returns:
-        Attachment: An Attachment object.
+        dict[str, Any]: The Adaptive Card element of the citation.
 
     """
     return {
@@ -63,14 +100,14 @@ def get_citations_element(citation: Citation) -> Attachment:
             },
             {
                 "type": "CodeBlock",
-                "codeSnippet": (json.dumps(citation.metadata) if citation.metadata else ""),
+                "codeSnippet": (_dumps(citation.metadata) if citation.metadata else ""),
                 "language": "Json",
             },
         ],
     }
 
 
-def get_media_element(media: Media) -> Attachment:
+def get_media_element(media: Media) -> dict[str, Any]:
     """
     Generates an Adaptive Card for displaying media attachments.
 
@@ -78,7 +115,7 @@ def get_media_element(media: Media) -> Attachment:
         media (Media): The media object containing the content and metadata.
 
     Returns:
-        Attachment: An Attachment object containing the Adaptive Card with media information.
+        dict[str, Any]: The Adaptive Card element with the media information.
 
     """
     return {
@@ -93,7 +130,35 @@ def get_media_element(media: Media) -> Attachment:
     }
 
 
-def get_chart_card(chart: Chart) -> Attachment:
+# Adaptive card element type of each chart model
+_CHART_TYPE_MAP: dict[type[Chart], str] = {
+    VerticalBarChart: "Chart.VerticalBar",
+    LineChart: "Chart.Line",
+    PieChart: "Chart.Pie",
+}
+
+_CHART_DATA_FIELDS = {"data"}
+
+
+def _dump_chart_data(chart: Chart) -> list[dict[str, Any]]:
+    """
+    Dumps the data points of a chart to JSON-compatible values.
+
+    The chart's pydantic-core serializer dumps all points in one call, instead of one model_dump call per point.
+
+    Args:
+        chart (Chart): The chart whose data to dump.
+
+    Returns:
+        list[dict[str, Any]]: The dumped data points.
+
+    """
+    if not chart.data:
+        return []
+    return chart.__pydantic_serializer__.to_python(chart, mode="json", include=_CHART_DATA_FIELDS)["data"]
+
+
+def get_chart_card(chart: Chart) -> dict[str, Any]:
     """
     Generates an Adaptive Card for displaying charts.
 
@@ -101,125 +166,236 @@ def get_chart_card(chart: Chart) -> Attachment:
         chart (Chart): The chart object containing the title, data, and type.
 
     Returns:
-        Attachment: An Attachment object containing the Adaptive Card with chart information.
+        dict[str, Any]: The Adaptive Card element with the chart information.
 
     Raises:
         ValueError: If the chart type is unsupported.
 
     """
-    type = ""
-    if isinstance(chart, VerticalBarChart):
-        type = "Chart.VerticalBar"
-    elif isinstance(chart, LineChart):
-        type = "Chart.Line"
-    elif isinstance(chart, PieChart):
-        type = "Chart.Pie"
-
-    if not type:
-        raise ValueError("Unsupported chart type")
+    chart_type = _CHART_TYPE_MAP.get(type(chart))
+    if chart_type is None:
+        # Subclasses of the supported charts miss the exact type lookup
+        chart_type = next((name for cls, name in _CHART_TYPE_MAP.items() if isinstance(chart, cls)), None)
+        if chart_type is None:
+            raise ValueError("Unsupported chart type")
 
     return {
         "id": chart.id,
-        "type": type,
+        "type": chart_type,
         "title": chart.title,
-        "data": [data.model_dump(mode="json") for data in chart.data] if chart.data else [],
+        "data": _dump_chart_data(chart),
     }
 
 
-def get_expandable_block(id: str, title: str, elements: list[Any]) -> dict[str, Any]:
+# Invariant elements shared by reference between all expandable blocks, they must not be modified
+_DOWN_IMAGE: dict[str, Any] = {
+    "type": "Image",
+    "url": "https://adaptivecards.io/content/down.png",
+    "width": "20px",
+    "altText": "collapsed",
+}
+_UP_IMAGE: dict[str, Any] = {
+    "type": "Image",
+    "url": "https://adaptivecards.io/content/up.png",
+    "width": "20px",
+    "altText": "expanded",
+}
+_FALLBACK_TEXTBLOCK: dict[str, Any] = {
+    "type": "TextBlock",
+    "text": "The elements for this block aren't supported.",
+    "wrap": True,
+}
+
+# Invariant structure of an expandable block, the id-dependent parts are filled in by _clone_with_id
+_EXPANDABLE_TEMPLATE: dict[str, Any] = {
+    "type": "Container",
+    "items": [
+        {
+            "type": "ColumnSet",
+            "columns": [
+                {
+                    "type": "Column",
+                    "items": [
+                        {
+                            "type": "TextBlock",
+                            "text": "",
+                            "wrap": True,
+                            "size": "Medium",
+                        }
+                    ],
+                    "width": "stretch",
+                },
+                {
+                    "type": "Column",
+                    "id": "",
+                    "spacing": "Small",
+                    "verticalContentAlignment": "Center",
+                    "items": [_DOWN_IMAGE],
+                    "width": "auto",
+                    "isVisible": False,
+                },
+                {
+                    "type": "Column",
+                    "id": "",
+                    "spacing": "Small",
+                    "verticalContentAlignment": "Center",
+                    "items": [_UP_IMAGE],
+                    "width": "auto",
+                },
+            ],
+            "selectAction": {
+                "type": "Action.ToggleVisibility",
+                "targetElements": [],
+            },
+        },
+        {
+            "type": "Container",
+            "id": "",
+            "items": [
+                {
+                    "type": "Container",
+                    "fallback": _FALLBACK_TEXTBLOCK,
+                    "items": [],
+                }
+            ],
+            "isVisible": False,
+        },
+    ],
+    "separator": True,
+    "spacing": "Small",
+}
+
+
+def _clone_with_id(template: dict[str, Any], id: str, title: str, elements: list[dict[str, Any]]) -> dict[str, Any]:
     """
-    Generates an expandable block for Adaptive Cards.
+    Clones an expandable block template, filling in its id, title and elements.
+
+    Only the dictionaries on the paths to the filled in values are copied, the invariant
+    parts of the template, e.g. the chevron images and the fallback, are shared.
 
     Args:
+        template (dict[str, Any]): The expandable block template.
         id (str): Unique identifier for the block.
         title (str): Title of the block.
-        elements (list[Any]): List of elements to be included in the block.
+        elements (list[dict[str, Any]]): List of elements to be included in the block.
 
     Returns:
         dict[str, Any]: A dictionary representing the expandable block structure.
 
     """
+    header, content = template["items"]
+    title_column, down_column, up_column = header["columns"]
+    (title_block,) = title_column["items"]
+    (content_container,) = content["items"]
+
+    down_id = "chevronDown" + id
+    up_id = "chevronUp" + id
+    content_id = "cardContent" + id
+
     return {
-        "type": "Container",
+        **template,
         "items": [
             {
-                "type": "ColumnSet",
+                **header,
                 "columns": [
-                    {
-                        "type": "Column",
-                        "items": [
-                            {
-                                "type": "TextBlock",
-                                "text": title,
-                                "wrap": True,
-                                "size": "Medium",
-                            }
-                        ],
-                        "width": "stretch",
-                    },
-                    {
-                        "type": "Column",
-                        "id": f"chevronDown{id}",
-                        "spacing": "Small",
-                        "verticalContentAlignment": "Center",
-                        "items": [
-                            {
-                                "type": "Image",
-                                "url": "https://adaptivecards.io/content/down.png",
-                                "width": "20px",
-                                "altText": "collapsed",
-                            }
-                        ],
-                        "width": "auto",
-                        "isVisible": False,
-                    },
-                    {
-                        "type": "Column",
-                        "id": f"chevronUp{id}",
-                        "spacing": "Small",
-                        "verticalContentAlignment": "Center",
-                        "items": [
-                            {
-                                "type": "Image",
-                                "url": "https://adaptivecards.io/content/up.png",
-                                "width": "20px",
-                                "altText": "expanded",
-                            }
-                        ],
-                        "width": "auto",
-                    },
+                    {**title_column, "items": [{**title_block, "text": title}]},
+                    {**down_column, "id": down_id},
+                    {**up_column, "id": up_id},
                 ],
-                "selectAction": {
-                    "type": "Action.ToggleVisibility",
-                    "targetElements": [
-                        f"cardContent{id}",
-                        f"chevronUp{id}",
-                        f"chevronDown{id}",
-                    ],
-                },
-            },
-            {
-                "type": "Container",
-                "id": f"cardContent{id}",
-                "items": [
-                    {
-                        "type": "Container",
-                        "fallback": {
-                            "type": "TextBlock",
-                            "text": "The elements for this block aren't supported.",
-                            "wrap": True,
-                        },
-                        "items": elements,
-                    }
-                ],
-                "isVisible": False,
+                "selectAction": {**header["selectAction"], "targetElements": [content_id, up_id, down_id]},
             },
+            {**content, "id": content_id, "items": [{**content_container, "items": elements}]},
         ],
-        "separator": True,
-        "spacing": "Small",
     }
 
 
+@functools.lru_cache(maxsize=8)
+def _expandable_skeleton(id: str, title: str) -> dict[str, Any]:
+    """
+    Gets the expandable block for an id and title, without elements.
+
+    The skeleton is shared between calls and must not be modified.
+
+    Args:
+        id (str): Unique identifier for the block.
+        title (str): Title of the block.
+
+    Returns:
+        dict[str, Any]: A dictionary representing the expandable block structure, with no elements.
+
+    """
+    return _clone_with_id(_EXPANDABLE_TEMPLATE, id, title, [])
+
+
+def get_expandable_block(id: str, title: str, elements: list[dict[str, Any]]) -> dict[str, Any]:
+    """
+    Generates an expandable block for Adaptive Cards.
+
+    Args:
+        id (str): Unique identifier for the block.
+        title (str): Title of the block.
+        elements (list[dict[str, Any]]): List of elements to be included in the block.
+
+    Returns:
+        dict[str, Any]: A dictionary representing the expandable block structure.
+
+    """
+    # Only the path to the elements is copied, the header is shared with the cached skeleton
+    skeleton = _expandable_skeleton(id, title)
+    header, content = skeleton["items"]
+    (content_container,) = content["items"]
+
+    return {
+        **skeleton,
+        "items": [header, {**content, "items": [{**content_container, "items": elements}]}],
+    }
+
+
+# Bucket index and element builder of an attachment type
+_AttachmentHandler = tuple[int, Callable[[Any], dict[str, Any]]]
+
+# Handler of each attachment type, see _get_attachment_handler
+_ATTACHMENT_HANDLERS: dict[type, _AttachmentHandler] = {
+    Citation: (0, get_citations_element),
+    Media: (1, get_media_element),
+    Chart: (2, get_chart_card),
+    VerticalBarChart: (2, get_chart_card),
+    LineChart: (2, get_chart_card),
+    PieChart: (2, get_chart_card),
+}
+
+
+def _get_attachment_handler(attachment_type: type) -> Optional[_AttachmentHandler]:
+    """
+    Gets the bucket index and element builder for an attachment type.
+
+    Subclasses of the registered types are resolved through their MRO once and then registered.
+
+    Args:
+        attachment_type (type): The type of the attachment.
+
+    Returns:
+        Optional[_AttachmentHandler]: The bucket index and element builder, or None if unsupported.
+
+    """
+    handler = _ATTACHMENT_HANDLERS.get(attachment_type)
+    if handler is None:
+        handler = next(
+            (_ATTACHMENT_HANDLERS[base] for base in attachment_type.__mro__ if base in _ATTACHMENT_HANDLERS), None
+        )
+        if handler is not None:
+            _ATTACHMENT_HANDLERS[attachment_type] = handler
+    return handler
+
+
+# Invariant fields of the adaptive card sent with a turn
+_ADAPTIVE_ENVELOPE: dict[str, Any] = {
+    "type": "AdaptiveCard",
+    "$schema": "http://adaptivecards.io/schemas/adaptive-card.json",
+    "fallbackText": "This card requires Adaptive Cards v1.2 support to be rendered properly.",
+}
+
+
 def get_activity_card(turn: ConversationTurn) -> Activity:
     """
     Generates an Activity card for a conversation turn.
@@ -231,19 +407,22 @@ def get_activity_card(turn: ConversationTurn) -> Activity:
         Activity: An Activity object containing the card with the conversation turn details.
 
     """
-    citations = []
-    media = []
-    charts = []
+    # Plain text turns need no card
+    if not turn.attachments:
+        return Activity(type=ActivityTypes.message, text=turn.content, attachments=None)
+
+    citations: list[dict[str, Any]] = []
+    media: list[dict[str, Any]] = []
+    charts: list[dict[str, Any]] = []
+    buckets = (citations, media, charts)
 
     for attachment in turn.attachments:
-        if isinstance(attachment, Citation):
-            citations.append(get_citations_element(attachment))
-        elif isinstance(attachment, Media):
-            media.append(get_media_element(attachment))
-        elif isinstance(attachment, Chart):
-            charts.append(get_chart_card(attachment))
-
-    attachments_body = []
+        handler = _get_attachment_handler(type(attachment))
+        if handler is not None:
+            index, build = handler
+            buckets[index].append(build(attachment))
+
+    attachments_body: list[dict[str, Any]] = []
     if citations:
         attachments_body.append(get_expandable_block("Citations", "Citations", citations))
     if media:
@@ -251,17 +430,14 @@ def get_activity_card(turn: ConversationTurn) -> Activity:
     if charts:
         attachments_body.append(get_expandable_block("Charts", "Charts", charts))
 
-    attachments_card = {
-        "type": "AdaptiveCard",
-        "body": attachments_body,
-        "$schema": "http://adaptivecards.io/schemas/adaptive-card.json",
-        "fallbackText": "This card requires Adaptive Cards v1.2 support to be rendered properly.",
-    }
+    # Attachments of unsupported types leave the body empty, and then no card is sent
+    attachments = None
+    if attachments_body:
+        attachments_card = {**_ADAPTIVE_ENVELOPE, "body": attachments_body}
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Generated Adaptive Card: %s", _dumps(attachments_card))
 
-    logger.info("Generated Adaptive Card: %s", attachments_card)
+        attachments = [CardFactory.adaptive_card(attachments_card)]
 
-    return Activity(
-        type=ActivityTypes.message,
-        text=turn.content,
-        attachments=([CardFactory.adaptive_card(attachments_card)] if (citations or media or charts) else None),
-    )
+    return Activity(type=ActivityTypes.message, text=turn.content, attachments=attachments)